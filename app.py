@@ -6,12 +6,12 @@ Aplicação Flask demonstrando uso do banco de dados
 import os
 import json
 from datetime import datetime
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import redis
-from scripts.redis_cache import CacheManager, CacheConfig
+from scripts.redis_cache import CacheManager, CacheConfig, CacheDatabase
 
 # Configuração da aplicação
 app = Flask(__name__)
@@ -33,6 +33,38 @@ def get_db_connection():
     """Cria conexão com PostgreSQL"""
     return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
 
+def cached_json_response(database, key, load_data):
+    """Serve resposta pré-codificada do cache, com ETag e gzip
+    
+    load_data só é chamado quando não há resposta em cache; deve garantir
+    que a chave de dados esteja populada e retornar os dados, ou None se
+    eles não existirem (nesse caso a função retorna None).
+    """
+    responses = cache_manager.responses
+    cached = responses.get_response(database, key)
+    
+    if cached is None:
+        data = load_data()
+        if data is None:
+            return None
+        # Chave de dados expirada ou não gravada: responder sem armazenar
+        cached = responses.set_response(database, key) or responses.encode_response(data)
+    
+    if cached.gzip_body and request.accept_encodings.quality('gzip') > 0:
+        etag = cached.gzip_etag
+        response = Response(cached.gzip_body, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        etag = cached.etag
+        response = Response(cached.body, mimetype='application/json')
+    
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/health')
 def health_check():
     """Endpoint de health check"""
@@ -118,7 +150,7 @@ def get_affiliates():
 @app.route('/api/affiliates/<affiliate_id>/stats')
 def get_affiliate_stats(affiliate_id):
     """Busca estatísticas de um afiliado (com cache)"""
-    try:
+    def load_data():
         # Tentar buscar do cache primeiro
         stats = cache_manager.affiliate_stats.get_affiliate_stats(affiliate_id)
         
@@ -137,13 +169,19 @@ def get_affiliate_stats(affiliate_id):
                         # Armazenar no cache
                         cache_manager.affiliate_stats.set_affiliate_stats(affiliate_id, stats)
         
-        if not stats:
+        return stats
+    
+    try:
+        response = cached_json_response(
+            CacheDatabase.AFFILIATE_STATS,
+            cache_manager.affiliate_stats.stats_key(affiliate_id),
+            load_data
+        )
+        
+        if response is None:
             return jsonify({'error': 'Affiliate not found'}), 404
         
-        return jsonify({
-            'data': stats,
-            'cached': stats is not None
-        })
+        return response
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -151,7 +189,7 @@ def get_affiliate_stats(affiliate_id):
 @app.route('/api/dashboard')
 def get_dashboard():
     """Dashboard principal com métricas gerais"""
-    try:
+    def load_data():
         # Tentar buscar do cache
         dashboard_data = cache_manager.reports.get_dashboard_data()
         
@@ -180,10 +218,14 @@ def get_dashboard():
                     # Armazenar no cache
                     cache_manager.reports.set_dashboard_data(dashboard_data)
         
-        return jsonify({
-            'data': dashboard_data,
-            'cached': dashboard_data is not None
-        })
+        return dashboard_data
+    
+    try:
+        return cached_json_response(
+            CacheDatabase.REPORTS,
+            cache_manager.reports.DASHBOARD_KEY,
+            load_data
+        )
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -191,7 +233,7 @@ def get_dashboard():
 @app.route('/api/rankings')
 def get_rankings():
     """Lista rankings ativos"""
-    try:
+    def load_data():
         # Tentar buscar do cache
         rankings = cache_manager.rankings.get_active_rankings()
         
@@ -221,10 +263,14 @@ def get_rankings():
                     # Armazenar no cache
                     cache_manager.rankings.set_active_rankings(rankings)
         
-        return jsonify({
-            'data': rankings,
-            'cached': rankings is not None
-        })
+        return rankings
+    
+    try:
+        return cached_json_response(
+            CacheDatabase.RANKINGS,
+            cache_manager.rankings.ACTIVE_RANKINGS_KEY,
+            load_data
+        )
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -7,8 +7,15 @@
 -- PREPARAÇÃO PARA MIGRAÇÃO
 -- =====================================================
 
--- Criar tabelas temporárias para importação dos dados
-CREATE TEMP TABLE temp_users (
+-- Criar tabelas de staging para importação dos dados
+-- (UNLOGGED em vez de TEMP: precisam ser visíveis para as conexões
+-- paralelas da reconciliação em scripts/migration_reconciliation.py)
+-- As tabelas persistem entre sessões. Se a lista de colunas mudar,
+-- remova-as antes de reexecutar este script:
+--   DROP TABLE temp_users, temp_deposits, temp_casino_bets CASCADE;
+-- (CASCADE remove também as views reconciliation_*; reaplique
+-- migrations/02_migration_reconciliation.sql em seguida)
+CREATE UNLOGGED TABLE IF NOT EXISTS temp_users (
     id TEXT,
     username TEXT,
     email TEXT,
@@ -20,7 +27,7 @@ CREATE TEMP TABLE temp_users (
     raw_data JSONB
 );
 
-CREATE TEMP TABLE temp_deposits (
+CREATE UNLOGGED TABLE IF NOT EXISTS temp_deposits (
     user_id TEXT,
     id TEXT,
     account_id TEXT,
@@ -39,7 +46,7 @@ CREATE TEMP TABLE temp_deposits (
     raw_data JSONB
 );
 
-CREATE TEMP TABLE temp_casino_bets (
+CREATE UNLOGGED TABLE IF NOT EXISTS temp_casino_bets (
     id TEXT,
     user_id TEXT,
     reference_game_id TEXT,
@@ -52,6 +59,9 @@ CREATE TEMP TABLE temp_casino_bets (
     raw_data JSONB
 );
 
+-- Descartar dados de importações anteriores antes de carregar novamente
+TRUNCATE temp_users, temp_deposits, temp_casino_bets;
+
 -- =====================================================
 -- FUNÇÃO: MIGRAÇÃO DE USUÁRIOS
 -- =====================================================
@@ -532,50 +542,34 @@ RETURNS TABLE (
     status TEXT
 ) AS $$
 BEGIN
-    -- Validar usuários
-    RETURN QUERY 
-    SELECT 
-        'users_migrated'::TEXT,
-        (SELECT COUNT(*) FROM temp_users)::BIGINT,
-        (SELECT COUNT(*) FROM users WHERE migrated_from = 'upbet_platform')::BIGINT,
-        CASE 
-            WHEN (SELECT COUNT(*) FROM temp_users) = (SELECT COUNT(*) FROM users WHERE migrated_from = 'upbet_platform')
-            THEN 'OK' ELSE 'ERROR' 
-        END;
-    
-    -- Validar afiliados
+    -- Cada contagem é calculada uma única vez
     RETURN QUERY 
-    SELECT 
-        'affiliates_created'::TEXT,
-        (SELECT COUNT(*) FROM users WHERE migrated_from = 'upbet_platform')::BIGINT,
-        (SELECT COUNT(*) FROM affiliates a JOIN users u ON a.user_id = u.id WHERE u.migrated_from = 'upbet_platform')::BIGINT,
-        CASE 
-            WHEN (SELECT COUNT(*) FROM users WHERE migrated_from = 'upbet_platform') = 
-                 (SELECT COUNT(*) FROM affiliates a JOIN users u ON a.user_id = u.id WHERE u.migrated_from = 'upbet_platform')
-            THEN 'OK' ELSE 'ERROR' 
-        END;
-    
-    -- Validar depósitos
-    RETURN QUERY 
-    SELECT 
-        'deposits_migrated'::TEXT,
-        (SELECT COUNT(*) FROM temp_deposits)::BIGINT,
-        (SELECT COUNT(*) FROM transactions WHERE source_table = 'deposits')::BIGINT,
-        CASE 
-            WHEN (SELECT COUNT(*) FROM temp_deposits) <= (SELECT COUNT(*) FROM transactions WHERE source_table = 'deposits')
-            THEN 'OK' ELSE 'CHECK' 
-        END;
-    
-    -- Validar apostas
-    RETURN QUERY 
-    SELECT 
-        'bets_migrated'::TEXT,
-        (SELECT COUNT(*) FROM temp_casino_bets)::BIGINT,
-        (SELECT COUNT(*) FROM transactions WHERE source_table = 'casino_bets')::BIGINT,
-        CASE 
-            WHEN (SELECT COUNT(*) FROM temp_casino_bets) <= (SELECT COUNT(*) FROM transactions WHERE source_table = 'casino_bets')
-            THEN 'OK' ELSE 'CHECK' 
-        END;
+    WITH counts AS (
+        SELECT
+            (SELECT COUNT(*) FROM temp_users) AS temp_users,
+            (SELECT COUNT(*) FROM users WHERE migrated_from = 'upbet_platform') AS users,
+            (SELECT COUNT(*) FROM affiliates a JOIN users u ON a.user_id = u.id WHERE u.migrated_from = 'upbet_platform') AS affiliates,
+            (SELECT COUNT(*) FROM temp_deposits) AS temp_deposits,
+            (SELECT COUNT(*) FROM transactions WHERE source_table = 'deposits') AS deposits,
+            (SELECT COUNT(*) FROM temp_casino_bets) AS temp_casino_bets,
+            (SELECT COUNT(*) FROM transactions WHERE source_table = 'casino_bets') AS casino_bets
+    )
+    SELECT v.item, v.expected, v.actual, v.result
+    FROM counts c
+    CROSS JOIN LATERAL (VALUES
+        -- Validar usuários
+        ('users_migrated'::TEXT, c.temp_users, c.users,
+         CASE WHEN c.temp_users = c.users THEN 'OK' ELSE 'ERROR' END),
+        -- Validar afiliados
+        ('affiliates_created'::TEXT, c.users, c.affiliates,
+         CASE WHEN c.users = c.affiliates THEN 'OK' ELSE 'ERROR' END),
+        -- Validar depósitos
+        ('deposits_migrated'::TEXT, c.temp_deposits, c.deposits,
+         CASE WHEN c.temp_deposits <= c.deposits THEN 'OK' ELSE 'CHECK' END),
+        -- Validar apostas
+        ('bets_migrated'::TEXT, c.temp_casino_bets, c.casino_bets,
+         CASE WHEN c.temp_casino_bets <= c.casino_bets THEN 'OK' ELSE 'CHECK' END)
+    ) AS v(item, expected, actual, result);
 END;
 $$ LANGUAGE plpgsql;
 
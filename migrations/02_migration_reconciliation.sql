@@ -0,0 +1,222 @@
+-- =====================================================
+-- FATURE DATABASE - RECONCILIAÇÃO DA MIGRAÇÃO
+-- Checksums por bucket entre staging (temp_*) e tabelas finais
+-- Orquestrado por scripts/migration_reconciliation.py
+-- =====================================================
+
+-- =====================================================
+-- FUNÇÕES AUXILIARES DE HASH
+-- =====================================================
+
+-- Bucket estável de um original_id (0 .. p_buckets - 1);
+-- original_id nulo vai para o bucket dedicado -1
+CREATE OR REPLACE FUNCTION migration_bucket(p_original_id TEXT, p_buckets INTEGER)
+RETURNS INTEGER AS $$
+    SELECT COALESCE(MOD(hashtext(p_original_id)::BIGINT + 2147483648, p_buckets)::INTEGER, -1);
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- Hash de 60 bits de (original_id, linha normalizada), cabe em BIGINT.
+-- O original_id entra no hash para que a troca de dados entre duas
+-- linhas do mesmo bucket altere o checksum
+CREATE OR REPLACE FUNCTION migration_row_hash(p_original_id TEXT, p_row_data TEXT)
+RETURNS BIGINT AS $$
+    SELECT ('x' || SUBSTRING(MD5(COALESCE(p_original_id, '') || '|' || p_row_data), 1, 15))::BIT(60)::BIGINT;
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- Conversão tolerante de texto para TIMESTAMP: retorna NULL em vez de
+-- abortar a consulta quando o valor não é uma data ISO válida
+-- (AAAA-MM-DD[ HH:MI[:SS[.ffffff]][fuso]]). Sem bloco EXCEPTION, para
+-- continuar PARALLEL SAFE. Linhas com data inválida aparecem como
+-- 'changed' ou 'missing_in_target' na reconciliação
+CREATE OR REPLACE FUNCTION migration_try_timestamp(p_value TEXT)
+RETURNS TIMESTAMP AS $$
+    SELECT CASE
+        WHEN m IS NULL THEN NULL
+        WHEN m[1]::INTEGER < 1 OR m[2]::INTEGER NOT BETWEEN 1 AND 12 THEN NULL
+        WHEN m[3]::INTEGER < 1
+          OR m[3]::INTEGER > EXTRACT(DAY FROM make_date(m[1]::INTEGER, m[2]::INTEGER, 1) + INTERVAL '1 month - 1 day')
+        THEN NULL
+        WHEN COALESCE(m[4]::INTEGER, 0) > 23
+          OR COALESCE(m[5]::INTEGER, 0) > 59
+          OR COALESCE(m[6]::INTEGER, 0) > 59
+        THEN NULL
+        ELSE TRIM(p_value)::TIMESTAMP
+    END
+    FROM regexp_match(
+        TRIM(p_value),
+        '^(\d{4})-(\d{2})-(\d{2})(?:[ T](\d{2}):(\d{2})(?::(\d{2})(?:\.\d+)?)?(?:Z|[+-](?:0\d|1[0-5])(?::?[0-5]\d)?)?)?$'
+    ) AS r(m);
+$$ LANGUAGE sql STABLE PARALLEL SAFE;
+
+-- =====================================================
+-- VIEWS DE RECONCILIAÇÃO
+-- Cada entidade tem uma view de origem e uma de destino com
+-- (original_id, row_data), normalizadas da mesma forma que as
+-- funções de migração transformam os dados
+-- =====================================================
+
+-- Usuários
+CREATE OR REPLACE VIEW reconciliation_users_source AS
+SELECT
+    id AS original_id,
+    ROW(email, COALESCE(username, 'Usuário Migrado'), migration_try_timestamp(created_at))::TEXT AS row_data
+FROM temp_users;
+
+CREATE OR REPLACE VIEW reconciliation_users_target AS
+SELECT
+    original_id::TEXT AS original_id,
+    ROW(email, name, created_at)::TEXT AS row_data
+FROM users
+WHERE migrated_from = 'upbet_platform';
+
+-- Afiliados (origem: usuários migrados ativos)
+CREATE OR REPLACE VIEW reconciliation_affiliates_source AS
+SELECT
+    original_id::TEXT AS original_id,
+    ROW(id, created_at)::TEXT AS row_data
+FROM users
+WHERE migrated_from = 'upbet_platform'
+AND deleted_at IS NULL;
+
+CREATE OR REPLACE VIEW reconciliation_affiliates_target AS
+SELECT
+    u.original_id::TEXT AS original_id,
+    ROW(a.user_id, a.joined_at)::TEXT AS row_data
+FROM affiliates a
+JOIN users u ON a.user_id = u.id
+WHERE u.migrated_from = 'upbet_platform';
+
+-- Depósitos
+CREATE OR REPLACE VIEW reconciliation_deposits_source AS
+SELECT
+    id AS original_id,
+    ROW(amount, COALESCE(currency, 'BRL'), migration_try_timestamp(created_at))::TEXT AS row_data
+FROM temp_deposits;
+
+CREATE OR REPLACE VIEW reconciliation_deposits_target AS
+SELECT
+    original_id::TEXT AS original_id,
+    ROW(amount, currency, created_at)::TEXT AS row_data
+FROM transactions
+WHERE source_table = 'deposits';
+
+-- Apostas de casino
+CREATE OR REPLACE VIEW reconciliation_casino_bets_source AS
+SELECT
+    id AS original_id,
+    ROW(amount, migration_try_timestamp(created_at))::TEXT AS row_data
+FROM temp_casino_bets;
+
+CREATE OR REPLACE VIEW reconciliation_casino_bets_target AS
+SELECT
+    original_id::TEXT AS original_id,
+    ROW(amount, created_at)::TEXT AS row_data
+FROM transactions
+WHERE source_table = 'casino_bets';
+
+-- =====================================================
+-- FUNÇÃO: CHECKSUMS POR BUCKET
+-- Calcula apenas os buckets da partição p_partition
+-- (bucket mod p_partitions = p_partition); cada partição roda
+-- em uma conexão própria que importa o mesmo snapshot
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION reconciliation_bucket_checksums(
+    p_view TEXT,
+    p_buckets INTEGER,
+    p_partitions INTEGER,
+    p_partition INTEGER
+)
+RETURNS TABLE (
+    bucket INTEGER,
+    row_count BIGINT,
+    checksum NUMERIC
+) AS $$
+BEGIN
+    -- O bucket -1 (original_id nulo) fica com a partição 0
+    RETURN QUERY EXECUTE format(
+        'SELECT b.bucket, COUNT(*), SUM(migration_row_hash(b.original_id, b.row_data))
+         FROM (
+             SELECT migration_bucket(original_id, $1) AS bucket, original_id, row_data
+             FROM %I
+         ) b
+         WHERE MOD(GREATEST(b.bucket, 0), $2) = $3
+         GROUP BY b.bucket',
+        p_view
+    )
+    USING p_buckets, p_partitions, p_partition;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =====================================================
+-- FUNÇÃO: DIVERGÊNCIAS DOS BUCKETS
+-- Compara por original_id apenas os buckets informados.
+-- Cada original_id divergente gera uma linha, com a quantidade
+-- de registros em cada lado; ids repetidos são reportados como
+-- duplicate_in_source / duplicate_in_target e ids nulos (bucket
+-- -1) como null_original_id, uma linha por lado
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION reconciliation_bucket_rows(
+    p_entity TEXT,
+    p_buckets INTEGER,
+    p_bucket_ids INTEGER[]
+)
+RETURNS TABLE (
+    original_id TEXT,
+    issue TEXT,
+    source_count BIGINT,
+    target_count BIGINT,
+    source_data TEXT,
+    target_data TEXT
+) AS $$
+BEGIN
+    RETURN QUERY EXECUTE format(
+        'WITH s AS (
+             SELECT original_id, COUNT(*) AS n, MIN(row_data) AS row_data
+             FROM %I
+             WHERE migration_bucket(original_id, $1) = ANY($2)
+             GROUP BY original_id
+         ), t AS (
+             SELECT original_id, COUNT(*) AS n, MIN(row_data) AS row_data
+             FROM %I
+             WHERE migration_bucket(original_id, $1) = ANY($2)
+             GROUP BY original_id
+         )
+         SELECT
+             COALESCE(s.original_id, t.original_id),
+             CASE
+                 WHEN s.original_id IS NULL AND t.original_id IS NULL THEN ''null_original_id''
+                 WHEN s.n > 1 THEN ''duplicate_in_source''
+                 WHEN t.n > 1 THEN ''duplicate_in_target''
+                 WHEN t.n IS NULL THEN ''missing_in_target''
+                 WHEN s.n IS NULL THEN ''unexpected_in_target''
+                 ELSE ''changed''
+             END,
+             COALESCE(s.n, 0),
+             COALESCE(t.n, 0),
+             s.row_data,
+             t.row_data
+         FROM s
+         FULL OUTER JOIN t ON s.original_id = t.original_id
+         WHERE s.original_id IS NULL
+         OR t.original_id IS NULL
+         OR s.n > 1
+         OR t.n > 1
+         OR s.row_data <> t.row_data',
+        'reconciliation_' || p_entity || '_source',
+        'reconciliation_' || p_entity || '_target'
+    )
+    USING p_buckets, p_bucket_ids;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =====================================================
+-- COMENTÁRIOS
+-- =====================================================
+
+COMMENT ON FUNCTION migration_bucket(TEXT, INTEGER) IS 'Bucket estável de um original_id para reconciliação';
+COMMENT ON FUNCTION migration_row_hash(TEXT, TEXT) IS 'Hash de 60 bits de original_id e linha normalizada';
+COMMENT ON FUNCTION migration_try_timestamp(TEXT) IS 'Conversão de texto ISO para TIMESTAMP que retorna NULL em valores inválidos';
+COMMENT ON FUNCTION reconciliation_bucket_checksums(TEXT, INTEGER, INTEGER, INTEGER) IS 'Contagem e checksum por bucket de uma partição';
+COMMENT ON FUNCTION reconciliation_bucket_rows(TEXT, INTEGER, INTEGER[]) IS 'Linhas divergentes entre origem e destino nos buckets informados';
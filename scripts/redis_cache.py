@@ -5,10 +5,11 @@ Sistema de cache para otimização de performance
 
 import redis
 import json
+import gzip
 import hashlib
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Union
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum
 
 class CacheDatabase(Enum):
@@ -41,6 +42,19 @@ class CacheConfig:
     socket_connect_timeout: int = 5
     retry_on_timeout: bool = True
     health_check_interval: int = 30
+    response_compress_min_size: int = 1024
+
+@dataclass
+class CachedResponse:
+    """Resposta HTTP pré-codificada armazenada no cache"""
+    body: bytes
+    etag: str
+    gzip_body: Optional[bytes] = None
+    
+    @property
+    def gzip_etag(self) -> str:
+        """ETag da representação gzip (distinta da representação sem compressão)"""
+        return f'{self.etag}-gz'
 
 class FatureRedisCache:
     """Classe principal para gerenciamento de cache Redis do sistema Fature"""
@@ -74,6 +88,17 @@ class FatureRedisCache:
         key_parts = [prefix] + [str(arg) for arg in args]
         return ':'.join(key_parts)
     
+    def _response_key(self, key: str) -> str:
+        """Gera chave da resposta pré-codificada associada a uma chave de dados"""
+        return self._generate_key('response', key)
+    
+    def _set_with_response_invalidation(self, key: str, ttl: int, data: str):
+        """Armazena dados e descarta a resposta pré-codificada correspondente"""
+        pipe = self.db.pipeline()
+        pipe.setex(key, ttl, data)
+        pipe.delete(self._response_key(key))
+        pipe.execute()
+    
     def _serialize_data(self, data: Any) -> str:
         """Serializa dados para armazenamento"""
         if isinstance(data, (dict, list)):
@@ -94,17 +119,21 @@ class AffiliateStatsCache(FatureRedisCache):
         super().__init__(config)
         self.db = self.get_connection(CacheDatabase.AFFILIATE_STATS)
     
+    def stats_key(self, affiliate_id: str) -> str:
+        """Chave das estatísticas de afiliado"""
+        return self._generate_key('affiliate:stats', affiliate_id)
+    
     def get_affiliate_stats(self, affiliate_id: str) -> Optional[Dict]:
         """Busca estatísticas de afiliado no cache"""
-        key = self._generate_key('affiliate:stats', affiliate_id)
+        key = self.stats_key(affiliate_id)
         data = self.db.get(key)
         return self._deserialize_data(data) if data else None
     
     def set_affiliate_stats(self, affiliate_id: str, stats: Dict, ttl: int = CacheTTL.MEDIUM.value):
         """Armazena estatísticas de afiliado no cache"""
-        key = self._generate_key('affiliate:stats', affiliate_id)
+        key = self.stats_key(affiliate_id)
         data = self._serialize_data(stats)
-        self.db.setex(key, ttl, data)
+        self._set_with_response_invalidation(key, ttl, data)
     
     def get_affiliate_hierarchy(self, affiliate_id: str) -> Optional[List]:
         """Busca hierarquia de afiliado no cache"""
@@ -133,7 +162,8 @@ class AffiliateStatsCache(FatureRedisCache):
     def invalidate_affiliate_cache(self, affiliate_id: str):
         """Invalida todo o cache de um afiliado"""
         patterns = [
-            f'affiliate:stats:{affiliate_id}',
+            self.stats_key(affiliate_id),
+            self._response_key(self.stats_key(affiliate_id)),
             f'affiliate:hierarchy:{affiliate_id}',
             f'affiliate:monthly:{affiliate_id}:*'
         ]
@@ -177,21 +207,23 @@ class CommissionCache(FatureRedisCache):
 class RankingCache(FatureRedisCache):
     """Cache específico para rankings e gamificação"""
     
+    ACTIVE_RANKINGS_KEY = 'ranking:active'
+    
     def __init__(self, config: CacheConfig = None):
         super().__init__(config)
         self.db = self.get_connection(CacheDatabase.RANKINGS)
     
     def get_active_rankings(self) -> Optional[List]:
         """Busca rankings ativos"""
-        key = 'ranking:active'
+        key = self.ACTIVE_RANKINGS_KEY
         data = self.db.get(key)
         return self._deserialize_data(data) if data else None
     
     def set_active_rankings(self, rankings: List, ttl: int = CacheTTL.SHORT.value):
         """Armazena rankings ativos"""
-        key = 'ranking:active'
+        key = self.ACTIVE_RANKINGS_KEY
         data = self._serialize_data(rankings)
-        self.db.setex(key, ttl, data)
+        self._set_with_response_invalidation(key, ttl, data)
     
     def get_ranking_participants(self, ranking_id: str) -> Optional[List]:
         """Busca participantes de um ranking"""
@@ -267,21 +299,23 @@ class SessionCache(FatureRedisCache):
 class ReportCache(FatureRedisCache):
     """Cache específico para relatórios"""
     
+    DASHBOARD_KEY = 'dashboard:main'
+    
     def __init__(self, config: CacheConfig = None):
         super().__init__(config)
         self.db = self.get_connection(CacheDatabase.REPORTS)
     
     def get_dashboard_data(self) -> Optional[Dict]:
         """Busca dados do dashboard"""
-        key = 'dashboard:main'
+        key = self.DASHBOARD_KEY
         data = self.db.get(key)
         return self._deserialize_data(data) if data else None
     
     def set_dashboard_data(self, dashboard_data: Dict, ttl: int = CacheTTL.SHORT.value):
         """Armazena dados do dashboard"""
-        key = 'dashboard:main'
+        key = self.DASHBOARD_KEY
         data = self._serialize_data(dashboard_data)
-        self.db.setex(key, ttl, data)
+        self._set_with_response_invalidation(key, ttl, data)
     
     def get_monthly_report(self, year: int, month: int) -> Optional[Dict]:
         """Busca relatório mensal"""
@@ -295,6 +329,78 @@ class ReportCache(FatureRedisCache):
         data = self._serialize_data(report_data)
         self.db.setex(key, ttl, data)
 
+class ResponseCache(FatureRedisCache):
+    """Cache de respostas HTTP já codificadas (JSON + gzip) com ETag
+    
+    As respostas ficam no mesmo database dos dados que as originam, sob a
+    chave 'response:<chave dos dados>'. O corpo é montado diretamente a
+    partir do valor armazenado na chave de dados, expira junto com ela e é
+    descartado sempre que esses dados são regravados ou invalidados.
+    """
+    
+    def __init__(self, config: CacheConfig = None):
+        # Corpos gzip são binários: conexões sem decode_responses
+        super().__init__(replace(config or CacheConfig(), decode_responses=False))
+    
+    def _build_response(self, data: bytes) -> CachedResponse:
+        """Monta o envelope JSON em torno dos dados já serializados"""
+        body = b'{"data":' + data + b',"cached":true}'
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        gzip_body = None
+        if len(body) >= self.config.response_compress_min_size:
+            gzip_body = gzip.compress(body, compresslevel=6, mtime=0)
+        return CachedResponse(body=body, etag=etag, gzip_body=gzip_body)
+    
+    def encode_response(self, data: Any) -> CachedResponse:
+        """Codifica uma resposta sem armazená-la no cache"""
+        return self._build_response(self._serialize_data(data).encode('utf-8'))
+    
+    def get_response(self, database: CacheDatabase, key: str) -> Optional[CachedResponse]:
+        """Busca resposta pré-codificada associada a uma chave de dados"""
+        data = self.get_connection(database).hgetall(self._response_key(key))
+        if not data or b'body' not in data:
+            return None
+        return CachedResponse(
+            body=data[b'body'],
+            etag=data[b'etag'].decode('ascii'),
+            gzip_body=data.get(b'gzip') or None
+        )
+    
+    def set_response(self, database: CacheDatabase, key: str) -> Optional[CachedResponse]:
+        """Codifica e armazena a resposta a partir do valor atual da chave de dados
+        
+        A chave de dados fica sob WATCH entre a leitura e a gravação: se ela
+        for regravada nesse intervalo, a resposta não é armazenada. A resposta
+        herda o tempo de vida restante dos dados. Retorna None se a chave de
+        dados não existir.
+        """
+        response_key = self._response_key(key)
+        
+        with self.get_connection(database).pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                data = pipe.get(key)
+                ttl_ms = pipe.pttl(key)
+                if data is None:
+                    return None
+                
+                cached = self._build_response(data)
+                mapping = {'body': cached.body, 'etag': cached.etag}
+                if cached.gzip_body is not None:
+                    mapping['gzip'] = cached.gzip_body
+                
+                pipe.multi()
+                pipe.delete(response_key)
+                pipe.hset(response_key, mapping=mapping)
+                if ttl_ms > 0:
+                    pipe.pexpire(response_key, ttl_ms)
+                pipe.execute()
+            except redis.WatchError:
+                # Dados regravados durante a montagem: servir sem armazenar
+                pass
+        
+        return cached
+
 class CacheManager:
     """Gerenciador principal de cache para o sistema Fature"""
     
@@ -305,6 +411,7 @@ class CacheManager:
         self.rankings = RankingCache(config)
         self.sessions = SessionCache(config)
         self.reports = ReportCache(config)
+        self.responses = ResponseCache(config)
     
     def health_check(self) -> Dict[str, bool]:
         """Verifica saúde de todas as conexões Redis"""